@@ -0,0 +1,82 @@
+import functools
+import hashlib
+import uuid
+
+import orjson
+from django.core.cache import cache
+from .models import Category, Color
+
+VOCAB_CACHE_KEY = 'store:vocab'
+VOCAB_CACHE_TIMEOUT = 300
+
+# Search results are cached under a version token that is replaced
+# whenever catalog data changes, which drops every cached search at once
+SEARCH_VERSION_KEY = 'store:psearch:version'
+SEARCH_CACHE_TIMEOUT = 60
+SEARCH_CRITERIA_KEYS = (
+    'type', 'color', 'category', 'min_price', 'max_price',
+    'featured_only', 'in_stock_only',
+)
+
+# Assistant replies to a fresh conversation, keyed on the user's message
+ASSISTANT_CACHE_TIMEOUT = 300
+
+
+def _load_vocab():
+    categories = list(Category.objects.values_list('name', flat=True))
+    colors = list(
+        Color.objects.filter(products__isnull=False)
+        .distinct()
+        .values_list('hex_code', flat=True)
+    )
+    return categories, colors
+
+
+def get_available_vocab():
+    """Category names and product color codes offered to the assistant"""
+    return cache.get_or_set(VOCAB_CACHE_KEY, _load_vocab, VOCAB_CACHE_TIMEOUT)
+
+
+def invalidate_vocab():
+    cache.delete(VOCAB_CACHE_KEY)
+
+
+def _catalog_version():
+    return cache.get_or_set(SEARCH_VERSION_KEY, uuid.uuid4().hex, None)
+
+
+def _search_cache_key(name, criteria):
+    version = _catalog_version()
+    # Only the filtering criteria matter, not e.g. the assistant's message
+    filters = {key: criteria.get(key) for key in SEARCH_CRITERIA_KEYS}
+    digest = hashlib.md5(
+        orjson.dumps(filters, option=orjson.OPT_SORT_KEYS, default=str),
+        usedforsecurity=False,
+    ).hexdigest()
+    return f'psearch:{version}:{name}:{digest}'
+
+
+def cached_search(func):
+    """Cache a product search function's results by its criteria"""
+    @functools.wraps(func)
+    def wrapper(criteria):
+        key = _search_cache_key(func.__name__, criteria)
+        results = cache.get(key)
+        if results is None:
+            results = func(criteria)
+            cache.set(key, results, SEARCH_CACHE_TIMEOUT)
+        return results
+    return wrapper
+
+
+def assistant_cache_key(message):
+    """Cache key for the assistant's reply to a message, ignoring case and spacing"""
+    normalized = ' '.join(message.lower().split())
+    digest = hashlib.sha1(
+        normalized.encode(), usedforsecurity=False).hexdigest()
+    # Replies embed search results, so they share the catalog version
+    return f'asst:{_catalog_version()}:{digest}'
+
+
+def invalidate_search_results():
+    cache.set(SEARCH_VERSION_KEY, uuid.uuid4().hex, None)
@@ -0,0 +1,37 @@
+# Generated by Django 5.2 on 2026-10-15 22:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChatHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('session_id', models.CharField(max_length=100)),
+                ('user_message', models.TextField()),
+                ('assistant_response', models.TextField()),
+                ('message_type', models.CharField(choices=[('product_search', 'بحث منتج'), ('normal_response', 'رد عادي')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='related_products',
+            field=models.ManyToManyField(blank=True, related_name='related_to', to='store.product'),
+        ),
+        migrations.AlterField(
+            model_name='productimage',
+            name='image',
+            field=models.FileField(upload_to='products/'),
+        ),
+    ]
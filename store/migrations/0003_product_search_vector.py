@@ -0,0 +1,35 @@
+# Generated by Django 5.2 on 2026-10-15 22:42
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+def populate_search_vector(apps, schema_editor):
+    Product = apps.get_model('store', 'Product')
+    Product.objects.update(search_vector=(
+        SearchVector('name', weight='A', config='simple') +
+        SearchVector('short_description', weight='B', config='simple') +
+        SearchVector('description', weight='C', config='simple')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0002_chathistory_product_related_products'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='store_produ_search__16796e_gin'),
+        ),
+        migrations.RunPython(populate_search_vector, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2 on 2026-10-15 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0004_category_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chathistory',
+            index=models.Index(fields=['session_id', '-created_at'], name='store_chath_session_4dc50d_idx'),
+        ),
+    ]
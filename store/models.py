@@ -1,5 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.urls import reverse
 from django.core.validators import MinValueValidator, MaxValueValidator
 from decimal import Decimal
@@ -31,6 +33,13 @@ class Category(TimeStampedModel):
     class Meta:
         verbose_name_plural = 'Categories'
         ordering = ['name']
+        # Trigram indexes let the icontains lookups on name/slug use an index
+        indexes = [
+            GinIndex(name='cat_name_trgm', fields=['name'],
+                     opclasses=['gin_trgm_ops']),
+            GinIndex(name='cat_slug_trgm', fields=['slug'],
+                     opclasses=['gin_trgm_ops']),
+        ]
 
     def __str__(self):
         return self.name
@@ -184,6 +193,19 @@ class Address(TimeStampedModel):
         super().save(*args, **kwargs)
 
 
+# Catalog text mixes Arabic and English, so no language-specific stemming
+PRODUCT_SEARCH_CONFIG = 'simple'
+
+
+def product_search_vector():
+    """Weighted search document built from the product's text fields"""
+    return (
+        SearchVector('name', weight='A', config=PRODUCT_SEARCH_CONFIG) +
+        SearchVector('short_description', weight='B', config=PRODUCT_SEARCH_CONFIG) +
+        SearchVector('description', weight='C', config=PRODUCT_SEARCH_CONFIG)
+    )
+
+
 class Product(TimeStampedModel):
     """Main Product model for furniture items"""
     CONDITION_CHOICES = [
@@ -248,6 +270,9 @@ class Product(TimeStampedModel):
     min_order_quantity = models.PositiveIntegerField(default=1)
     max_order_quantity = models.PositiveIntegerField(blank=True, null=True)
 
+    # Full-text search document, kept in sync by a post_save signal
+    search_vector = SearchVectorField(null=True, editable=False)
+
     class Meta:
         ordering = ['-created_at']
         indexes = [
@@ -256,6 +281,7 @@ class Product(TimeStampedModel):
             models.Index(fields=['is_featured', 'is_active']),
             models.Index(fields=['sku']),
             models.Index(fields=['price']),
+            GinIndex(fields=['search_vector']),
         ]
 
     def __str__(self):
@@ -524,3 +550,6 @@ class ChatHistory(models.Model):
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['session_id', '-created_at']),
+        ]
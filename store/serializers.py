@@ -51,19 +51,80 @@ class ProductListSerializer(serializers.ModelSerializer):
         ]
 
     def get_main_image(self, obj):
-        primary_image = obj.images.filter(is_primary=True).first()
+        # primary_images is filled by a Prefetch(to_attr=...) when available
+        if hasattr(obj, 'primary_images'):
+            primary_image = obj.primary_images[0] if obj.primary_images else None
+        else:
+            primary_image = obj.images.filter(is_primary=True).first()
         if primary_image and primary_image.image:
             request = self.context.get('request')
             return request.build_absolute_uri(primary_image.image.url) if request else primary_image.image.url
         return None
 
     def get_average_rating(self, obj):
+        # Use the SQL aggregates when the queryset was annotated
+        if hasattr(obj, 'avg_rating'):
+            return round(obj.avg_rating, 1) if obj.avg_rating is not None else 0
         return obj.average_rating
 
     def get_review_count(self, obj):
+        if hasattr(obj, 'review_cnt'):
+            return obj.review_cnt
         return obj.review_count
 
 
+class ProductSearchSerializer(ProductListSerializer):
+    """Product cards returned by the assistant search"""
+    price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, coerce_to_string=False, read_only=True)
+    sale_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, coerce_to_string=False, read_only=True)
+    effective_price = serializers.DecimalField(
+        max_digits=10, decimal_places=2, coerce_to_string=False, read_only=True)
+    discount_percentage = serializers.ReadOnlyField()
+    category = serializers.CharField(source='category.name', read_only=True)
+    is_in_stock = serializers.ReadOnlyField()
+    colors = serializers.SerializerMethodField()
+
+    class Meta(ProductListSerializer.Meta):
+        fields = [
+            'id', 'name', 'slug', 'price', 'sale_price', 'effective_price',
+            'discount_percentage', 'category', 'is_featured', 'is_on_sale',
+            'is_in_stock', 'average_rating', 'review_count', 'colors',
+            'short_description', 'main_image'
+        ]
+
+    def get_colors(self, obj):
+        return [color.name for color in obj.available_colors.all()]
+
+    def get_main_image(self, obj):
+        # main_image_name is selected by a subquery in the search queryset
+        if obj.main_image_name:
+            return ProductImage._meta.get_field('image').storage.url(
+                obj.main_image_name)
+        return None
+
+
+class ProductSearchDetailSerializer(ProductSearchSerializer):
+    """Search results for the product search API, with stock and SKU details"""
+    category = serializers.SerializerMethodField()
+
+    class Meta(ProductSearchSerializer.Meta):
+        fields = ProductSearchSerializer.Meta.fields + [
+            'stock_quantity', 'sku', 'condition'
+        ]
+
+    def get_category(self, obj):
+        return {
+            'id': obj.category.id,
+            'name': obj.category.name,
+            'slug': obj.category.slug,
+        }
+
+    def get_colors(self, obj):
+        return [{'id': color.id, 'name': color.name} for color in obj.available_colors.all()]
+
+
 class ProductDetailSerializer(serializers.ModelSerializer):
     """Detailed serializer for individual product view"""
     category = CategorySerializer(read_only=True)
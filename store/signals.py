@@ -0,0 +1,41 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from .caching import invalidate_search_results, invalidate_vocab
+from .models import (
+    Category, Color, Product, ProductImage, Review, product_search_vector
+)
+
+SEARCH_VECTOR_SOURCES = {'name', 'short_description', 'description'}
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Color)
+@receiver(post_delete, sender=Color)
+@receiver(post_delete, sender=Product)
+@receiver(m2m_changed, sender=Product.available_colors.through)
+def clear_vocab_cache(sender, **kwargs):
+    # The color list only includes colors attached to a product
+    invalidate_vocab()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(m2m_changed, sender=Product.available_colors.through)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+@receiver(post_save, sender=Category)
+@receiver(post_save, sender=Color)
+def clear_search_cache(sender, **kwargs):
+    invalidate_search_results()
+
+
+@receiver(post_save, sender=Product)
+def update_search_vector(sender, instance, update_fields=None, **kwargs):
+    if update_fields and not SEARCH_VECTOR_SOURCES.intersection(update_fields):
+        return
+    # update() skips save(), so this does not re-trigger the signal
+    Product.objects.filter(pk=instance.pk).update(
+        search_vector=product_search_vector())
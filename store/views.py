@@ -1,44 +1,108 @@
 from django.utils.decorators import method_decorator
 from rest_framework.views import APIView
 from .services import ImageSimilarityService
+from .caching import (
+    ASSISTANT_CACHE_TIMEOUT, assistant_cache_key, cached_search,
+    get_available_vocab,
+)
 from .serializers import ProductSerializer, ImageSearchSerializer
 import tempfile
 from rest_framework.parsers import MultiPartParser, FormParser
 import os
-from .models import Color
 import logging
-from openai import OpenAI
-from django.db.models import Q
+from openai import AsyncOpenAI
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, transaction
+from django.db.models import (
+    Avg, Count, Exists, OuterRef, Prefetch, Q, Subquery,
+)
+from django.contrib.postgres.search import SearchQuery
 from django.conf import settings
 from django.views.decorators.http import require_http_methods
 from django.views.decorators.csrf import csrf_exempt
+from django.core.cache import cache
 from django.http import JsonResponse, StreamingHttpResponse
-import re
-import json
+import asyncio
+import time
+import orjson
 from rest_framework import generics, status
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.encoders import JSONEncoder
 from django.shortcuts import get_object_or_404
-from .models import Category, Product, Review, Wishlist, ChatHistory
+from .models import (
+    PRODUCT_SEARCH_CONFIG, Category, Product, ProductImage, Review, Wishlist,
+    ChatHistory
+)
 from .serializers import (
     CategorySerializer, ProductListSerializer, ProductDetailSerializer,
+    ProductSearchSerializer, ProductSearchDetailSerializer,
     ReviewSerializer, WishlistSerializer
 )
 from django.utils import timezone
 
+logger = logging.getLogger(__name__)
+
 
 def hello_view(request):
     return JsonResponse({'message': 'hello'})
 
+
+# Columns read by ProductListSerializer (created_at feeds the cursor)
+PRODUCT_LIST_FIELDS = (
+    'id', 'name', 'slug', 'price', 'category', 'created_at',
+)
+
+# Columns read when building search results
+PRODUCT_SEARCH_FIELDS = (
+    'id', 'name', 'slug', 'price', 'sale_price', 'is_featured', 'is_on_sale',
+    'stock_quantity', 'short_description', 'sku', 'condition', 'is_active',
+    'category__name', 'category__slug', 'created_at',
+)
+
+
+def annotate_rating_stats(queryset):
+    """Aggregate approved review stats in SQL instead of loading every review"""
+    approved = Q(reviews__is_approved=True)
+    return queryset.annotate(
+        avg_rating=Avg('reviews__rating', filter=approved),
+        review_cnt=Count('reviews', filter=approved, distinct=True),
+    )
+
+
+def prefetch_primary_images():
+    """Load only the primary image of each product into primary_images"""
+    return Prefetch('images', queryset=ProductImage.objects.filter(
+        is_primary=True), to_attr='primary_images')
+
+
+def annotate_main_image(queryset, fallback=False):
+    """Select the stored file name of each product's main image in SQL"""
+    images = ProductImage.objects.filter(
+        product=OuterRef('pk')).exclude(image='')
+    if fallback:
+        # الصورة الرئيسية أو أول صورة كبديل
+        images = images.order_by('-is_primary', 'order', 'created_at')
+    else:
+        images = images.filter(is_primary=True)
+    return queryset.annotate(
+        main_image_name=Subquery(images.values('image')[:1]))
+
 # GET /api/products/ - List all products (replaces store view)
 
 
 class ProductListView(generics.ListAPIView):
 
-    queryset = Product.objects.all().select_related(
-        'category').prefetch_related('reviews', 'images')
+    queryset = annotate_rating_stats(Product.objects.all().select_related(
+        'category').prefetch_related(prefetch_primary_images()).only(
+        *PRODUCT_LIST_FIELDS))
     serializer_class = ProductListSerializer
+    # Cursor pagination keeps every page a bounded keyset scan
+    pagination_class = CursorPagination
+    ordering = '-created_at'
 
     permission_classes = [AllowAny]
 
@@ -59,8 +123,10 @@ class ProductListView(generics.ListAPIView):
 
 
 class CategoryListView(generics.ListAPIView):
-    queryset = Category.objects.all().prefetch_related('product')
+    queryset = Category.objects.all()
     serializer_class = CategorySerializer
+    pagination_class = CursorPagination
+    ordering = 'name'
     permission_classes = [AllowAny]
 
 # GET /api/products/<slug>/ - Get specific product (replaces product_info view)
@@ -81,8 +147,11 @@ class ProductDetailView(generics.RetrieveAPIView):
 @permission_classes([AllowAny])
 def category_products(request, category_slug):
     category = get_object_or_404(Category, slug=category_slug)
-    products = Product.objects.filter(category=category).select_related(
-        'category').prefetch_related('reviews')
+    products = annotate_rating_stats(
+        Product.objects.filter(category=category).select_related(
+            'category').prefetch_related(prefetch_primary_images()).only(
+            *PRODUCT_LIST_FIELDS)
+    ).order_by('-created_at')  # Meta.ordering is dropped by the GROUP BY
 
     category_data = CategorySerializer(category).data
     products_data = ProductListSerializer(products, many=True).data
@@ -90,7 +159,7 @@ def category_products(request, category_slug):
     return Response({
         'category': category_data,
         'products': products_data,
-        'total_products': products.count()
+        'total_products': len(products_data)
     })
 
 # Additional useful endpoints for your React app
@@ -103,16 +172,17 @@ def category_products(request, category_slug):
 def add_product_review(request, product_slug):
     product = get_object_or_404(Product, slug=product_slug)
 
-    # Check if user already reviewed this product
-    if Review.objects.filter(product=product, user=request.user).exists():
-        return Response(
-            {'error': 'You have already reviewed this product'},
-            status=status.HTTP_400_BAD_REQUEST
-        )
-
     serializer = ReviewSerializer(data=request.data)
     if serializer.is_valid():
-        serializer.save(product=product, user=request.user)
+        # unique_together on (product, user) rejects a second review
+        try:
+            with transaction.atomic():
+                serializer.save(product=product, user=request.user)
+        except IntegrityError:
+            return Response(
+                {'error': 'You have already reviewed this product'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -130,14 +200,12 @@ class WishlistView(generics.ListCreateAPIView):
         product_id = self.request.data.get('product_id')
         product = get_object_or_404(Product, id=product_id)
 
-        # Check if already in wishlist
-        if Wishlist.objects.filter(user=self.request.user, product=product).exists():
-            return Response(
-                {'error': 'Product already in wishlist'},
-                status=status.HTTP_400_BAD_REQUEST
-            )
-
-        serializer.save(user=self.request.user, product=product)
+        # unique_together on (user, product) rejects a duplicate entry
+        try:
+            with transaction.atomic():
+                serializer.save(user=self.request.user, product=product)
+        except IntegrityError:
+            raise ValidationError({'error': 'Product already in wishlist'})
 
 # DELETE /api/wishlist/<id>/ - Remove from wishlist
 
@@ -150,27 +218,35 @@ class WishlistDeleteView(generics.DestroyAPIView):
         return Wishlist.objects.filter(user=self.request.user)
 
 
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+_client = None
+
+
+def get_openai():
+    """Create the OpenAI client on first use and reuse it afterwards"""
+    global _client
+    if _client is None:
+        # Bounded timeout/retries so an OpenAI stall cannot hang the request
+        _client = AsyncOpenAI(
+            api_key=settings.OPENAI_API_KEY, timeout=30.0, max_retries=2)
+    return _client
 
 
 def get_chat_history(session_id, limit=5):
     """جلب تاريخ المحادثة للسياق"""
     history = ChatHistory.objects.filter(
         session_id=session_id
-    ).order_by('-created_at')[:limit]
-
-    context = []
-    for chat in reversed(history):  # عكس الترتيب للحصول على الترتيب الصحيح
-        context.append({
-            'role': 'user',
-            'content': chat.user_message
-        })
-        context.append({
-            'role': 'assistant',
-            'content': chat.assistant_response
-        })
-
-    return context
+    ).order_by('-created_at').values_list(
+        'user_message', 'assistant_response')[:limit]
+
+    # عكس الترتيب للحصول على الترتيب الصحيح
+    return [
+        message
+        for user_message, assistant_response in reversed(list(history))
+        for message in (
+            {'role': 'user', 'content': user_message},
+            {'role': 'assistant', 'content': assistant_response},
+        )
+    ]
 
 
 def save_chat_history(session_id, user_message, assistant_response, message_type):
@@ -183,116 +259,223 @@ def save_chat_history(session_id, user_message, assistant_response, message_type
     )
 
 
+# References to pending history writes so they are not garbage collected
+_history_tasks = set()
+
+
+def save_chat_history_later(*args):
+    """Write the chat turn in the background so the stream can close first"""
+    task = asyncio.create_task(sync_to_async(save_chat_history)(*args))
+    _history_tasks.add(task)
+    task.add_done_callback(_history_tasks.discard)
+
+
+# Deltas longer than this are re-chunked so the UI does not stall on bursts
+STREAM_BURST_SIZE = 50
+STREAM_PIECE_SIZE = 4
+STREAM_PIECE_DELAY = 0.02
+# Small deltas are batched up to this size or interval before being sent
+STREAM_BATCH_SIZE = 32
+STREAM_BATCH_INTERVAL = 0.025
+
+
+async def smooth_chunks(content):
+    """Split an oversized delta into small pieces paced for smooth rendering"""
+    if len(content) <= STREAM_BURST_SIZE:
+        yield content
+        return
+
+    for start in range(0, len(content), STREAM_PIECE_SIZE):
+        if start:
+            await asyncio.sleep(STREAM_PIECE_DELAY)
+        yield content[start:start + STREAM_PIECE_SIZE]
+
+
+SSE_CLOSED = b'data: {"system":"closed"}\n\n'
+
+
+def sse_event(payload):
+    """Encode one server-sent event straight to bytes"""
+    # Prices arrive as Decimal from the serializer
+    return b'data: ' + orjson.dumps(payload, default=float) + b'\n\n'
+
+
+async def text_frames(text, prefix=b''):
+    """Chunk frames for a piece of reply text, with prefix on the first one"""
+    async for piece in smooth_chunks(text):
+        yield prefix + sse_event({'chunk': piece})
+        prefix = b''
+
+
+async def replay_reply(reply):
+    """Stream a cached assistant reply the same way a live one is streamed"""
+    if reply['type'] == 'product_search':
+        yield sse_event({'type': 'product_search'})
+        yield sse_event(reply['result'])
+        return
+
+    async for frame in text_frames(
+            reply['response'], sse_event({'type': 'normal_response'})):
+        yield frame
+
+
+WEBSITE_NAME = "Funco"
+
+# Built once at import; it only depends on constants
+ASSISTANT_SYSTEM_PROMPT = f"""
+You are a friendly assistant for {WEBSITE_NAME}, a furniture and home decor website.
+Use the previous conversation context to give a consistent and relevant reply.
+
+If the user is explicitly or implicitly looking to buy or browse a specific item (furniture, decor, etc.), call the search_products function.
+Guidelines for search_products:
+- The result must include exactly one color and one category, for only one product.
+- The "color" and "category" values must exactly match one of the allowed options.
+- "message" should be written in the user's language and reflect their intent clearly.
+- If the user’s intent is unclear, write a helpful "message" and include your best guess for color and category.
+
+If the message is asking general questions, exploring available options (like asking about colors or categories), or casual conversation without product intent, respond naturally and helpfully without calling any function.
+"""
+
+
+def build_search_tool(categories, colors):
+    """Function schema the assistant calls when the user wants a product"""
+    color = {"type": "string", "description": "Color code of the product"}
+    category = {"type": "string", "description": "Product category"}
+    if colors:
+        color["enum"] = colors
+    if categories:
+        category["enum"] = categories
+
+    return {
+        "type": "function",
+        "function": {
+            "name": "search_products",
+            "description": "Search the catalog for the product the user is looking for",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "message": {
+                        "type": "string",
+                        "description": "Additional message to the user, in the user's language",
+                    },
+                    "color": color,
+                    "category": category,
+                },
+                "required": ["message", "color", "category"],
+            },
+        },
+    }
+
+
 @csrf_exempt
 @require_http_methods(["POST"])
-def product_assistant_stream(request):
+async def product_assistant_stream(request):
     """
     Endpoint محسن يحلل رسالة المستخدم مع الذاكرة ودعم متعدد اللغات
     """
     # Parse request data
-    data = json.loads(request.body)
+    data = orjson.loads(request.body)
     user_message = data.get('message', '')
     session_id = data.get(
         'session_id', f"session_{timezone.now().timestamp()}")
-    website_name = "Funco"
 
     if not user_message:
         return JsonResponse({
             'error': 'الرسالة مطلوبة'
         }, status=400)
 
-    chat_context = get_chat_history(session_id)
+    chat_context = await sync_to_async(get_chat_history)(session_id)
 
-    available_categories = list(
-        Category.objects.values_list('name', flat=True))
-    available_colors = list(
-        Color.objects.filter(products__isnull=False)
-        .distinct()
-        .values_list('hex_code', flat=True)
-    )
+    available_categories, available_colors = await sync_to_async(
+        get_available_vocab)()
+
+    # Without earlier context the reply depends only on the message
+    cache_key = None
+    if not chat_context:
+        cache_key = await sync_to_async(assistant_cache_key)(user_message)
+
+    async def generate_response():
+        cached = await cache.aget(cache_key) if cache_key else None
+        if cached is not None:
+            async for frame in replay_reply(cached):
+                yield frame
+            save_chat_history_later(
+                session_id, user_message, cached['response'], cached['type'])
+            yield SSE_CLOSED
+            return
 
-    def generate_response():
         context_messages = chat_context + [
             {"role": "user", "content": user_message}
         ]
 
-        pre_analysis_prompt = f"""
-Quick analysis: Is the user asking to find a specific product?
-
-You have access to the previous conversation for context.
-User message: "{user_message}"
-
-Respond with one word only:
-- "product" → if the user is explicitly or implicitly looking to buy or browse a specific item (furniture, decor, etc.)
-- "general" → if the message is asking general questions, exploring available options (like asking about colors or categories), or casual conversation without product intent
-"""
-
-        pre_response = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[{"role": "system", "content": pre_analysis_prompt}
-                      ] + context_messages[-3:],
-            max_tokens=10,
-            temperature=0.1
-        )
-
-        is_product_search = "product" in pre_response.choices[0].message.content
-
-        response_type = "product_search" if is_product_search else "normal_response"
-        yield f'data: {{"type":"{response_type}"}}\n\n'
-        print("available_colors " + ', '.join(available_colors))
-
-        if is_product_search:
-            analysis_prompt = f"""
-You are an intelligent assistant for {website_name}, a furniture and home decor website.
-
-Available categories: [{', '.join(available_categories)}]
-Available colors: [{', '.join(available_colors)}]
-
-The user is searching for a product. Use the previous conversation context to better understand the request.
-Always respond with this exact JSON format:
-{{"product_search": true, "message": "additional message", "color": "color", "category": "category"}}
-
-Guidelines:
-- The result must include exactly one color and one category.
-- The result must be only one product.
-- The "color" and "category" values must exactly match one of the available options above (same spelling and case).
-- Use English for all values in the JSON **except** "message".
-- "message" should be written in the user's language and reflect their intent clearly.
-- If the user’s intent is unclear, respond with a helpful message in "message" and include your best guess for color and category."""
-        else:
-            analysis_prompt = f"""
-        You are a friendly assistant for {website_name}, a furniture and home decor website.
-
-        The user is not searching for a specific product. Respond naturally and helpfully.
-        Use the previous conversation context to give a consistent and relevant reply.
-        """
-
-        response = client.chat.completions.create(
+        # One streaming call: the model either answers in text or calls
+        # search_products, which replaces the separate classification call
+        response = await get_openai().chat.completions.create(
             model="gpt-3.5-turbo",
-            messages=[{"role": "system", "content": analysis_prompt}
+            messages=[{"role": "system", "content": ASSISTANT_SYSTEM_PROMPT}
                       ] + context_messages,
+            tools=[build_search_tool(available_categories, available_colors)],
+            tool_choice="auto",
+            parallel_tool_calls=False,
             max_tokens=300,
             temperature=0.3,
             stream=True
         )
 
-        full_response = ""
+        logger.debug("available_colors %s", available_colors)
 
-        for chunk in response:
-            if chunk.choices[0].delta.content is not None:
-                content = chunk.choices[0].delta.content
-                full_response += content
-                if (not is_product_search):
-                    yield f"data: {json.dumps({'chunk': content}, ensure_ascii=False)}\n\n"
+        is_product_search = None
+        full_response = ""
+        # Frames produced back to back go out in a single write
+        pending = b''
+        batch = ''
+        last_flush = time.monotonic()
+
+        async for chunk in response:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+
+            if is_product_search is None:
+                # The opening delta only carries the role
+                if not (delta.tool_calls or delta.content):
+                    continue
+                is_product_search = bool(delta.tool_calls)
+                if is_product_search:
+                    yield sse_event({'type': 'product_search'})
+                else:
+                    pending = sse_event({'type': 'normal_response'})
+
+            if is_product_search:
+                for tool_call in delta.tool_calls or []:
+                    if tool_call.function and tool_call.function.arguments:
+                        full_response += tool_call.function.arguments
+            elif delta.content:
+                full_response += delta.content
+                batch += delta.content
+                if (len(batch) >= STREAM_BATCH_SIZE or
+                        time.monotonic() - last_flush >= STREAM_BATCH_INTERVAL):
+                    async for frame in text_frames(batch, pending):
+                        yield frame
+                    batch, pending = '', b''
+                    last_flush = time.monotonic()
+
+        if batch:
+            async for frame in text_frames(batch, pending):
+                yield frame
+
+        if is_product_search is None:
+            yield sse_event({'type': 'normal_response'})
 
         if is_product_search:
-            print("full_response " + full_response)
-            print("full_response " + str(json.loads(full_response)))
+            logger.debug("full_response %s", full_response)
 
-            product_data = json.loads(full_response)
+            product_data = {'product_search': True,
+                            **orjson.loads(full_response)}
 
-            products_found = search_products_by_criteria(product_data)
-            print("json_match " + str(products_found))
+            products_found = await sync_to_async(
+                search_products_by_criteria)(product_data)
+            logger.debug("json_match %s", products_found)
 
             result_data = {
                 'final_result': 'product_search',
@@ -301,29 +484,47 @@ Guidelines:
                 'products_found': len(products_found),
                 'products': products_found[:10]
             }
-            yield f"data: {json.dumps(result_data, ensure_ascii=False)}\n\n"
-            save_chat_history(
+            save_chat_history_later(
                 session_id,
                 user_message,
                 full_response,
                 'product_search',
             )
+            if cache_key:
+                await cache.aset(cache_key, {
+                    'type': 'product_search',
+                    'response': full_response,
+                    'result': result_data,
+                }, ASSISTANT_CACHE_TIMEOUT)
+            yield sse_event(result_data) + SSE_CLOSED
 
         else:
-            save_chat_history(session_id, user_message,
-                              full_response, 'normal_response')
-        yield f'data: {{"system":"closed"}}\n\n'
+            save_chat_history_later(
+                session_id, user_message, full_response, 'normal_response')
+            if cache_key and full_response:
+                await cache.aset(cache_key, {
+                    'type': 'normal_response',
+                    'response': full_response,
+                }, ASSISTANT_CACHE_TIMEOUT)
+            yield SSE_CLOSED
 
     response = StreamingHttpResponse(
         generate_response(), content_type='text/event-stream')
     response['Cache-Control'] = 'no-cache'
     response['Connection'] = 'keep-alive'
+    # Stop nginx from buffering the event stream
+    response['X-Accel-Buffering'] = 'no'
     response['Access-Control-Allow-Origin'] = '*'
     response['Access-Control-Allow-Headers'] = 'Content-Type'
 
     return response
 
 
+# حجم صفحة تاريخ المحادثة
+CHAT_HISTORY_PAGE_SIZE = 50
+CHAT_HISTORY_MAX_PAGE_SIZE = 200
+
+
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_chat_history_endpoint(request):
@@ -332,23 +533,40 @@ def get_chat_history_endpoint(request):
     if not session_id:
         return JsonResponse({'error': 'session_id مطلوب'}, status=400)
 
-    history = ChatHistory.objects.filter(
-        session_id=session_id
-    ).order_by('created_at').values(
+    try:
+        limit = int(request.GET.get('limit', CHAT_HISTORY_PAGE_SIZE))
+        before = request.GET.get('before')
+        before = int(before) if before else None
+    except ValueError:
+        return JsonResponse({'error': 'limit و before يجب أن تكون أرقاماً'}, status=400)
+    limit = max(1, min(limit, CHAT_HISTORY_MAX_PAGE_SIZE))
+
+    history = ChatHistory.objects.filter(session_id=session_id)
+    if before is not None:
+        history = history.filter(id__lt=before)
+
+    # أحدث الرسائل أولاً ثم عكسها للحصول على الترتيب الزمني
+    page = list(history.order_by('-id').values(
+        'id',
         'user_message',
         'assistant_response',
         'message_type',
         'created_at'
-    )
+    )[:limit])
+    page.reverse()
 
-    return JsonResponse({'history': list(history)})
+    return JsonResponse({
+        'history': page,
+        # معرف أقدم رسالة في الصفحة لجلب الصفحة السابقة
+        'next_cursor': page[0]['id'] if len(page) == limit else None,
+    })
 
 
 @csrf_exempt
 @require_http_methods(["DELETE"])
 def clear_chat_history(request):
     """مسح تاريخ المحادثة لجلسة معينة"""
-    data = json.loads(request.body)
+    data = orjson.loads(request.body)
     session_id = data.get('session_id')
 
     if not session_id:
@@ -363,87 +581,107 @@ def clear_chat_history(request):
     })
 
 
-def search_products_by_criteria(criteria):
+ANY_COLOR = 'أي لون'
+
+# نتائج البحث تُقرأ على دفعات بدلاً من تحميلها كلها في الذاكرة
+SEARCH_CHUNK_SIZE = 100
+
+
+def clean_colors(colors):
+    """قائمة الألوان المطلوبة بدون القيم الفارغة أو 'أي لون'"""
+    if not isinstance(colors, list):
+        colors = [colors]
+    return [color for color in colors if color and color != ANY_COLOR]
+
+
+def has_any_color(colors, field):
+    """EXISTS على جدول الألوان بدلاً من JOIN يكرر الصفوف ويتطلب distinct()"""
+    color_q = Q()
+    for color in colors:
+        color_q |= Q(**{f'color__{field}__icontains': color})
+    return Exists(Product.available_colors.through.objects.filter(
+        color_q, product=OuterRef('pk')))
+
+
+def _search_products(criteria, *, include_stock_filter=True, detailed=False,
+                     color_field='name'):
     """
-    دالة للبحث في المنتجات حسب المعايير المحددة
+    بناء استعلام البحث في المنتجات مرة واحدة لكل من المساعد و API البحث
     """
-    # try:
-    queryset = Product.objects.filter(is_active=True).select_related(
-        'category').prefetch_related('reviews', 'images')
+    queryset = annotate_main_image(annotate_rating_stats(
+        Product.objects.filter(is_active=True).select_related(
+            'category').prefetch_related(
+            'available_colors').only(*PRODUCT_SEARCH_FIELDS)),
+        fallback=detailed)
+
+    # فلترة المنتجات المتوفرة فقط
+    if include_stock_filter and criteria.get('in_stock_only', True):
+        queryset = queryset.filter(stock_quantity__gt=0)
 
-    print("search_products_by_criteria " + str(criteria))
+    # فلترة المنتجات المميزة فقط
+    if criteria.get('featured_only'):
+        queryset = queryset.filter(is_featured=True)
 
+    # البحث حسب النوع/الاسم
     if criteria.get('type'):
         product_type = criteria['type']
+        queryset = queryset.filter(search_vector=SearchQuery(
+            product_type, config=PRODUCT_SEARCH_CONFIG))
+
+    # البحث حسب الفئة
+    if criteria.get('category'):
+        category = criteria['category']
         queryset = queryset.filter(
-            Q(name__icontains=product_type) |
-            Q(description__icontains=product_type) |
-            Q(short_description__icontains=product_type)
+            Q(category__name__icontains=category) |
+            Q(category__slug__icontains=category)
         )
 
-    print("search_products_by_criteria " + str(queryset))
-
-    # if criteria.get('category'):
-    #     category = criteria['category']
-    #     queryset = queryset.filter(
-    #         Q(category__name__icontains=category) |
-    #         Q(category__slug__icontains=category)
-    #     )
+    # البحث حسب اللون
+    colors = clean_colors(criteria.get('color'))
+    if colors:
+        queryset = queryset.filter(has_any_color(colors, color_field))
 
-    print("search_products_by_criteria category " + str(queryset))
-
-    if criteria.get('color'):
-        colors = criteria['color']
-        if isinstance(colors, list):
-            color_q = Q()
-            for color in colors:
-                color_q |= Q(available_colors__hex_code__icontains=color)
-            queryset = queryset.filter(color_q)
-        else:
-            queryset = queryset.filter(
-                available_colors__hex_code__icontains=colors)
+    # فلترة حسب السعر
+    if criteria.get('min_price'):
+        try:
+            min_price = float(criteria['min_price'])
+            queryset = queryset.filter(price__gte=min_price)
+        except ValueError:
+            pass
 
-    print("search_products_by_criteria " + str(queryset))
+    if criteria.get('max_price'):
+        try:
+            max_price = float(criteria['max_price'])
+            queryset = queryset.filter(price__lte=max_price)
+        except ValueError:
+            pass
 
     # ترتيب النتائج (المنتجات المميزة أولاً، ثم الأحدث)
-    queryset = queryset.distinct().order_by('-is_featured', '-created_at')
-
-    print("search_products_by_criteria " + str(queryset))
+    if detailed:
+        queryset = queryset.order_by(
+            '-is_featured', '-is_on_sale', '-created_at')
+    else:
+        queryset = queryset.order_by('-is_featured', '-created_at')
 
-    products = queryset[:20]  # أول 20 منتج
+    products = queryset[:20].iterator(chunk_size=SEARCH_CHUNK_SIZE)  # أول 20 منتج
 
     # تحويل إلى JSON format
-    products_data = []
-    for product in products:
-        product_data = {
-            'id': product.id,
-            'name': product.name,
-            'slug': product.slug,
-            'price': float(product.price),
-            'sale_price': float(product.sale_price) if product.sale_price else None,
-            'effective_price': float(product.effective_price),
-            'discount_percentage': product.discount_percentage,
-            'category': product.category.name if product.category else None,
-            'is_featured': product.is_featured,
-            'is_on_sale': product.is_on_sale,
-            'is_in_stock': product.is_in_stock,
-            'average_rating': product.average_rating,
-            'review_count': product.review_count,
-            'colors': [color.name for color in product.available_colors.all()],
-            'short_description': product.short_description,
-        }
-
-        # إضافة الصورة الرئيسية
-        main_image = product.images.filter(is_primary=True).first()
-        if main_image:
-            product_data['main_image'] = main_image.image.url
+    serializer_class = (ProductSearchDetailSerializer if detailed
+                        else ProductSearchSerializer)
+    return serializer_class(products, many=True).data
 
-        products_data.append(product_data)
 
-    return products_data
+@cached_search
+def search_products_by_criteria(criteria):
+    """
+    دالة للبحث في المنتجات حسب المعايير المحددة
+    """
+    logger.debug("search_products_by_criteria %s", criteria)
 
-    # except Exception as e:
-    #     return []
+    # المساعد يرسل الألوان كرموز hex، وفلترة الفئة معطلة لهذا المسار
+    criteria = {k: v for k, v in criteria.items() if k != 'category'}
+    return _search_products(
+        criteria, include_stock_filter=False, color_field='hex_code')
 
 
 # API endpoint منفصل للبحث المباشر في المنتجات
@@ -476,7 +714,7 @@ def search_products_api(request):
             'search_criteria': search_criteria,
             'products_found': len(products),
             'products': products
-        }, json_dumps_params={'ensure_ascii': False})
+        }, encoder=JSONEncoder, json_dumps_params={'ensure_ascii': False})
 
     except Exception as e:
         return JsonResponse({
@@ -485,115 +723,13 @@ def search_products_api(request):
         }, status=500, json_dumps_params={'ensure_ascii': False})
 
 
+@cached_search
 def search_products_advanced(criteria):
     """
     دالة بحث متقدمة للمنتجات مع خيارات إضافية
     """
     try:
-        # بدء الاستعلام الأساسي
-        queryset = Product.objects.filter(is_active=True).select_related(
-            'category').prefetch_related('reviews', 'images')
-
-        # فلترة المنتجات المتوفرة فقط
-        if criteria.get('in_stock_only', True):
-            queryset = queryset.filter(stock_quantity__gt=0)
-
-        # فلترة المنتجات المميزة فقط
-        if criteria.get('featured_only'):
-            queryset = queryset.filter(is_featured=True)
-
-        # البحث حسب النوع/الاسم
-        if criteria.get('type'):
-            product_type = criteria['type']
-            queryset = queryset.filter(
-                Q(name__icontains=product_type) |
-                Q(description__icontains=product_type) |
-                Q(short_description__icontains=product_type)
-            )
-
-        # البحث حسب الفئة
-        if criteria.get('category'):
-            category = criteria['category']
-            queryset = queryset.filter(
-                Q(category__name__icontains=category) |
-                Q(category__slug__icontains=category)
-            )
-
-        # البحث حسب اللون
-        colors = criteria.get('color')
-        if colors and colors != ['أي لون']:
-            if isinstance(colors, list) and len(colors) > 0:
-                color_q = Q()
-                for color in colors:
-                    if color and color != 'أي لون':
-                        color_q |= Q(available_colors__name__icontains=color)
-                if color_q:
-                    queryset = queryset.filter(color_q)
-
-        # فلترة حسب السعر
-        if criteria.get('min_price'):
-            try:
-                min_price = float(criteria['min_price'])
-                queryset = queryset.filter(price__gte=min_price)
-            except ValueError:
-                pass
-
-        if criteria.get('max_price'):
-            try:
-                max_price = float(criteria['max_price'])
-                queryset = queryset.filter(price__lte=max_price)
-            except ValueError:
-                pass
-
-        # ترتيب النتائج
-        queryset = queryset.distinct().order_by(
-            '-is_featured', '-is_on_sale', '-created_at')
-
-        products = queryset[:20]  # أول 20 منتج
-
-        # تحويل إلى JSON format
-        products_data = []
-        for product in products:
-            product_data = {
-                'id': product.id,
-                'name': product.name,
-                'slug': product.slug,
-                'price': float(product.price),
-                'sale_price': float(product.sale_price) if product.sale_price else None,
-                'effective_price': float(product.effective_price),
-                'discount_percentage': product.discount_percentage,
-                'category': {
-                    'id': product.category.id if product.category else None,
-                    'name': product.category.name if product.category else None,
-                    'slug': product.category.slug if product.category else None
-                },
-                'is_featured': product.is_featured,
-                'is_on_sale': product.is_on_sale,
-                'is_in_stock': product.is_in_stock,
-                'stock_quantity': product.stock_quantity,
-                'average_rating': product.average_rating,
-                'review_count': product.review_count,
-                'colors': [{'id': color.id, 'name': color.name} for color in product.available_colors.all()],
-                'short_description': product.short_description,
-                'sku': product.sku,
-                'condition': product.condition,
-            }
-
-            # إضافة الصورة الرئيسية
-            main_image = product.images.filter(is_primary=True).first()
-            if main_image and main_image.image:
-                product_data['main_image'] = main_image.image.url
-            else:
-                # إضافة أول صورة متاحة
-                first_image = product.images.first()
-                if first_image and first_image.image:
-                    product_data['main_image'] = first_image.image.url
-                else:
-                    product_data['main_image'] = None
-
-            products_data.append(product_data)
-
-        return products_data
+        return _search_products(criteria, detailed=True)
 
     except Exception as e:
         return []